@@ -5,21 +5,36 @@ from dotenv import load_dotenv
 import os
 from fastapi import FastAPI
 
-llm = ChatOllama(model="llama3.2:3b")
+load_dotenv()
 
-analysis_prompt = ChatPromptTemplate.from_template(
-    """
-    you are an expert content analyst.
-    analyze the following video transcript.
 
-    Extract:
-    - main topics covered
-    - positive insights  
-    - summary
+def _env_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
 
-    Transcript:
-    {transcript}
-    """
+
+# Q4_K_M reads about a third of the FP16 weight bytes per token, which bounds local decode speed.
+# keep_alive keeps the model resident so its prompt-prefix KV cache survives between runs.
+llm = ChatOllama(
+    model=os.getenv("OLLAMA_MODEL", "llama3.2:3b-instruct-q4_K_M"),
+    keep_alive="30m",
+    num_ctx=_env_int("OLLAMA_NUM_CTX"),
+    num_thread=_env_int("OLLAMA_NUM_THREAD"),
+    num_gpu=_env_int("OLLAMA_NUM_GPU"),
+)
+
+INSTRUCTIONS = """
+you are an expert content analyst.
+analyze the video transcript in the user message.
+
+Extract:
+- main topics covered
+- positive insights
+- summary
+"""
+
+analysis_prompt = ChatPromptTemplate.from_messages(
+    [("system", INSTRUCTIONS), ("user", "{transcript}")]
 )
 
 loader = YoutubeLoader.from_youtube_url(
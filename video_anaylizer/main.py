@@ -1,11 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from src.api.routes import router
+from src.services.analysis_service import AnalysisService
+from src.services.youtube_service import YouTubeService
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One service per process: the LLM client, prompts and connection pool are built once.
+    app.state.analysis_service = AnalysisService()
+    yield
+    await app.state.analysis_service.aclose()
+    await YouTubeService.aclose()
+
 
 app = FastAPI(
     title="YouTube AI Analyzer API",
     description="AI-powered YouTube video content analysis with structured responses",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -26,6 +43,7 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "analyze": "POST /api/v1/analyze",
+            "stream": "GET /api/v1/analyze/stream",
             "test": "GET /api/v1/test",
             "health": "GET /api/v1/health",
             "docs": "/docs",
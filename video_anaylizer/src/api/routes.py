@@ -1,39 +1,56 @@
-from fastapi import APIRouter, Depends
+import orjson
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from ..services.analysis_service import AnalysisService
+from ..services.youtube_service import YouTubeService
 from ..models.schemas import AnalysisRequest, AnalysisResponse, AnalysisType
 
 router = APIRouter()
 
-def get_service():
-    return AnalysisService()
+def get_service(request: Request) -> AnalysisService:
+    return request.app.state.analysis_service
+
+
+def _render(response: AnalysisResponse) -> ORJSONResponse:
+    # The service already built this model; returning a Response skips FastAPI's
+    # response_model re-validation, which stays on the routes for the OpenAPI docs.
+    return ORJSONResponse(content=response.model_dump(mode="json"))
 
 
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_video(request: AnalysisRequest, service: AnalysisService = Depends(get_service)):
-    return await service.analyze(request.youtube_url, request.analysis_type)
+    return _render(await service.analyze(request.youtube_url, request.analysis_type))
 
 
 @router.get("/analyze/summary", response_model=AnalysisResponse)
 async def analyze_summary(url: str, service: AnalysisService = Depends(get_service)):
-    return await service.analyze(url, AnalysisType.summary_only)
+    return _render(await service.analyze(url, AnalysisType.summary_only))
 
 
 @router.get("/analyze/topics", response_model=AnalysisResponse)
 async def analyze_topics(url: str, service: AnalysisService = Depends(get_service)):
-    return await service.analyze(url, AnalysisType.topics_only)
+    return _render(await service.analyze(url, AnalysisType.topics_only))
 
 
 @router.get("/analyze/insights", response_model=AnalysisResponse)
 async def analyze_insights(url: str, service: AnalysisService = Depends(get_service)):
-    return await service.analyze(url, AnalysisType.insights_only)
+    return _render(await service.analyze(url, AnalysisType.insights_only))
+
+
+@router.get("/analyze/stream")
+async def analyze_stream(url: str, service: AnalysisService = Depends(get_service)):
+    async def events():
+        async for item in service.analyze_stream(url):
+            yield f"event: {item['event']}\ndata: {orjson.dumps(item['data']).decode()}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 @router.get("/debug/raw-llm")
 async def debug_raw(url: str, service: AnalysisService = Depends(get_service)):
-    data = await service.youtube_service.get_transcript_async(url)
-    transcript = data["transcript"][:4000]
+    data = await YouTubeService.get_transcript_async(url)
+    transcript = await service.truncate_transcript(data.transcript, max_tokens=1000)
 
-    chain = service._setup_prompts() | service.llm
-    result = chain.invoke({"transcript": transcript})
+    result = await service.raw_chain.ainvoke({"transcript": transcript})
 
     return {"raw_output": result.content}
@@ -2,7 +2,18 @@ from enum import Enum
 from typing import List, Optional
 
 from pydantic import BaseModel, Field, field_validator
-import re
+
+_YT_HOSTS = ("youtube.com/", "youtu.be/")
+
+
+def _is_youtube_url(url: str) -> bool:
+    # Plain prefix checks, equivalent to matching (https?://)?(www\.)?(youtube\.com|youtu\.be)/.+
+    rest = url.removeprefix("https://") if url.startswith("https://") else url.removeprefix("http://")
+    rest = rest.removeprefix("www.")
+    for host in _YT_HOSTS:
+        if rest.startswith(host):
+            return rest[len(host):len(host) + 1] not in ("", "\n")
+    return False
 
 
 class AnalysisType(str, Enum):
@@ -87,8 +98,7 @@ class AnalysisRequest(BaseModel):
 
     @field_validator("youtube_url")
     def validate_youtube_url(cls, url: str):
-        pattern = r"(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+"
-        if not re.match(pattern, url):
+        if not _is_youtube_url(url):
             raise ValueError("Invalid YouTube URL format")
         return url
 
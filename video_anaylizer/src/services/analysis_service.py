@@ -1,12 +1,21 @@
 import os
+import re
 import time
+import asyncio
 import logging
-from typing import List, Optional
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional
 from dotenv import load_dotenv
 
+import httpx
+import openai
+import tiktoken
+from cachetools import TTLCache
 from langchain_openai import ChatOpenAI
+from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 
 # Schema imports
 from ..models.schemas import (
@@ -19,73 +28,220 @@ from ..models.schemas import (
     KeyMoment
 )
 from .youtube_service import YouTubeService
+from .semantic_cache import SemanticCache
+from .circuit_breaker import CircuitBreaker
 
 load_dotenv()
 
 logger = logging.getLogger("AnalysisService")
 logger.setLevel(logging.INFO)
 
+_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
 
-class LLMResponseSchema(BaseModel):
+# Prefill time scales with tokens, so the transcript is capped by tokens, not characters.
+MAX_TRANSCRIPT_TOKENS = 6000
+# Fallback when the tokenizer cannot be loaded: English BPE averages about 4 characters per token.
+_CHARS_PER_TOKEN = 4
+
+# Bump whenever the analysis prompts change so stale cached responses are not served.
+PROMPT_VERSION = "v3"
+
+# Kept free of per-request data so each system prompt is a byte-identical prefix
+# across calls, letting the model server reuse its KV cache for it.
+SUMMARY_INSTRUCTIONS = """Analyze the YouTube transcript in the user message professionally.
+
+1. Suggest a clear Title and identify the Speaker/Channel (Author).
+2. Identify 'Key Moments' - assign estimated timestamps based on transcript flow.
+3. Provide a high-quality Summary."""
+
+TOPICS_INSTRUCTIONS = """Analyze the YouTube transcript in the user message professionally.
+
+Extract the 3-5 main Topics covered, each with a short description."""
+
+INSIGHTS_INSTRUCTIONS = """Analyze the YouTube transcript in the user message professionally.
+
+Extract the key Insights, each categorized as positive, negative or neutral."""
+
+# Process-wide so every AnalysisService instance shares them.
+_response_cache: TTLCache = TTLCache(maxsize=256, ttl=24 * 60 * 60)
+_inflight_analyses: Dict[str, asyncio.Future] = {}
+
+# Transient errors get one jittered retry; a sustained outage opens the breaker so
+# requests fail fast instead of each waiting out its own retries.
+_RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError)
+_llm_breaker = CircuitBreaker(
+    fail_max=5,
+    reset_timeout=30.0,
+    failure_types=_RETRYABLE_ERRORS + (openai.InternalServerError,),
+)
+
+
+@lru_cache(maxsize=None)
+def _encoding_for(model: str) -> Optional[tiktoken.Encoding]:
+    # The first load downloads the BPE file unless TIKTOKEN_CACHE_DIR already holds it.
+    # A failure is cached too, so an unreachable host doesn't stall every request.
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, truncating by characters instead: {e}")
+        return None
+
+
+def _truncate_tokens(text: str, model: str, max_tokens: int) -> str:
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return text[: max_tokens * _CHARS_PER_TOKEN]
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+# Opt-in: needs a local Ollama serving the embedding model.
+_semantic_cache: Optional[SemanticCache] = (
+    SemanticCache() if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true" else None
+)
+
+
+class SummarySection(BaseModel):
     title: str = Field(description="Most suitable title for the video")
     author: str = Field(description="Speaker or channel name")
+    key_moments: List[KeyMoment] = Field(description="Key events with estimated timestamps")
+    summary: str = Field(description="A comprehensive summary")
 
+
+class TopicsSection(BaseModel):
     topics: List[Topic] = Field(description="List of key topics")
+
+
+class InsightsSection(BaseModel):
     insights: List[Insight] = Field(description="List of key insights")
-    key_moments: List[KeyMoment] = Field(description="Key events with estimated timestamps")
-    summary: str = Field(description="A comprehensive summary")
+
+
+class LLMResponseSchema(BaseModel):
+    """Merged result of the section prompts; sections not requested stay empty."""
+
+    title: str = ""
+    author: str = ""
+
+    topics: List[Topic] = Field(default_factory=list)
+    insights: List[Insight] = Field(default_factory=list)
+    key_moments: List[KeyMoment] = Field(default_factory=list)
+    summary: str = ""
 
 
 class AnalysisService:
     def __init__(self, model: str = "gpt-4o-mini"):
+        self.model = model
+        # The service is shared for the app's lifetime, so one pooled client serves every request.
+        # HTTP/2 multiplexes the concurrent section calls over one connection.
+        self._http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(300.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0),
+        )
         self.llm = ChatOpenAI(
             model=model,
             temperature=0,
-            max_retries=2
-        ).with_structured_output(LLMResponseSchema, strict=True)
+            max_retries=0,
+            http_async_client=self._http_client,
+        )
 
-        self.youtube_service = YouTubeService()
         self._setup_prompts()
+        self._setup_chains()
+
+    async def aclose(self) -> None:
+        await self._http_client.aclose()
 
     def _setup_prompts(self):
-        self.analysis_prompt = ChatPromptTemplate.from_template(
-            """
-            Analyze the following YouTube transcript professionally.
-
-            1. Suggest a clear Title and identify the Speaker/Channel (Author).
-            2. Extract 3-5 main Topics.
-            3. Extract key Insights (positive/negative/neutral).
-            4. Identify 'Key Moments' - assign estimated timestamps based on transcript flow.
-            5. Provide a high-quality Summary.
-
-            Transcript:
-            {transcript}
-            """
+        self.summary_prompt = ChatPromptTemplate.from_messages(
+            [("system", SUMMARY_INSTRUCTIONS), ("user", "{transcript}")]
+        )
+        self.topics_prompt = ChatPromptTemplate.from_messages(
+            [("system", TOPICS_INSTRUCTIONS), ("user", "{transcript}")]
+        )
+        self.insights_prompt = ChatPromptTemplate.from_messages(
+            [("system", INSIGHTS_INSTRUCTIONS), ("user", "{transcript}")]
         )
 
+        # Streaming asks for plain JSON text so partial objects can be parsed as tokens arrive.
+        self.summary_parser = JsonOutputParser(pydantic_object=SummarySection)
+        self.summary_stream_prompt = ChatPromptTemplate.from_messages(
+            [("system", SUMMARY_INSTRUCTIONS + "\n\n{format_instructions}"), ("user", "{transcript}")]
+        ).partial(format_instructions=self.summary_parser.get_format_instructions())
+
+    def _setup_chains(self):
+        # Bound once per service (one per process), so each schema is converted a single time.
+        self.summary_chain = self.summary_prompt | self._structured(SummarySection)
+        self.topics_chain = self.topics_prompt | self._structured(TopicsSection)
+        self.insights_chain = self.insights_prompt | self._structured(InsightsSection)
+        self.summary_stream_chain = self.summary_stream_prompt | self.llm | self.summary_parser
+        # Unparsed model output for the debug endpoint.
+        self.raw_chain = self.summary_prompt | self.llm
+
+    def _structured(self, schema: type[BaseModel]):
+        return self.llm.with_structured_output(schema, method="json_schema", strict=True)
+
+    def _chains_for(self, mode: AnalysisType):
+        return {
+            AnalysisType.summary_only: [self.summary_chain],
+            AnalysisType.topics_only: [self.topics_chain],
+            AnalysisType.insights_only: [self.insights_chain],
+        }.get(mode, [self.summary_chain, self.topics_chain, self.insights_chain])
+
     async def analyze(self, youtube_url: str, mode: AnalysisType = AnalysisType.full):
         start_time = time.time()
+        cache_key = self._cache_key(youtube_url, mode)
+        cached = _response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            logger.info(f"Cache hit: {cache_key}")
+            return AnalysisResponse(**{**cached, "processing_time": time.time() - start_time})
+
+        if not cache_key:
+            return await self._run_analysis(youtube_url, mode, start_time, None)
+
+        # Concurrent requests for the same video and mode share one pipeline run.
+        pending = _inflight_analyses.get(cache_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._run_analysis(youtube_url, mode, start_time, cache_key))
+            _inflight_analyses[cache_key] = pending
+            pending.add_done_callback(lambda _: _inflight_analyses.pop(cache_key, None))
+        # Shielded so one client disconnecting does not cancel the run for the others.
+        response = await asyncio.shield(pending)
+        return response.model_copy(update={"processing_time": time.time() - start_time})
+
+    async def _run_analysis(
+        self, youtube_url: str, mode: AnalysisType, start_time: float, cache_key: Optional[str]
+    ) -> AnalysisResponse:
         try:
             logger.info(f"Processing: {youtube_url}")
 
-            video_data = await self.youtube_service.get_transcript_async(youtube_url)
-            if not video_data["success"]:
-                return self._error_response(video_data.get("error", "Transcript retrieval failed"), start_time)
+            # The transcript download is network-bound; load the embedding model meanwhile.
+            video_data, _ = await asyncio.gather(
+                YouTubeService.get_transcript_async(youtube_url),
+                self._warm_up(),
+            )
+            if not video_data.success:
+                return self._error_response(video_data.error or "Transcript retrieval failed", start_time)
 
-            transcript_text = video_data["transcript"][:8000]
+            transcript_text = await self.truncate_transcript(video_data.transcript)
 
-            chain = self.analysis_prompt | self.llm
-            result: LLMResponseSchema = await chain.ainvoke({"transcript": transcript_text})
+            result = await self._analyze_transcript(transcript_text, mode)
 
-            metadata = VideoMetadata(
-                title=video_data.get("video_title") if video_data.get("video_title") != "Unknown" else result.title,
-                author=video_data.get("author") if video_data.get("author") != "Unknown" else result.author,
-                video_id=video_data.get("video_id"),
+            # Everything below is built from validated structured output or our own
+            # transcript data, so skip re-validating it.
+            metadata = VideoMetadata.model_construct(
+                title=video_data.video_title if video_data.video_title != "Unknown" else result.title or None,
+                author=video_data.author if video_data.author != "Unknown" else result.author or None,
+                video_id=video_data.video_id,
             )
 
             transcript_chunks = self._split_transcript(transcript_text)
 
-            return AnalysisResponse(
+            response = AnalysisResponse.model_construct(
                 success=True,
                 transcript_chunks=transcript_chunks,
                 topics=result.topics,
@@ -96,24 +252,97 @@ class AnalysisService:
                 processing_time=time.time() - start_time,
                 error=None,
             )
+            if cache_key:
+                _response_cache[cache_key] = response.model_dump()
+            return response
 
         except Exception as e:
             logger.error(f"Analysis failed: {e}")
             return self._error_response(str(e), start_time)
 
+    async def analyze_stream(self, youtube_url: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield transcript chunks first, then the summary section as it is generated."""
+        try:
+            video_data = await YouTubeService.get_transcript_async(youtube_url)
+            if not video_data.success:
+                yield {"event": "error", "data": {"error": video_data.error or "Transcript retrieval failed"}}
+                return
+
+            transcript_text = await self.truncate_transcript(video_data.transcript)
+            yield {
+                "event": "transcript_chunks",
+                "data": [chunk.model_dump() for chunk in self._split_transcript(transcript_text)],
+            }
+
+            async for partial in self.summary_stream_chain.astream({"transcript": transcript_text}):
+                yield {"event": "summary", "data": partial}
+            yield {"event": "done", "data": {}}
+
+        except Exception as e:
+            logger.error(f"Streaming analysis failed: {e}")
+            yield {"event": "error", "data": {"error": str(e)}}
+
+    async def truncate_transcript(self, text: str, max_tokens: int = MAX_TRANSCRIPT_TOKENS) -> str:
+        # Encoding a long transcript is CPU work; keep it off the event loop.
+        return await asyncio.to_thread(_truncate_tokens, text, self.model, max_tokens)
+
+    async def _warm_up(self) -> None:
+        if _semantic_cache is not None:
+            await _semantic_cache.warm_up()
+
+    async def _analyze_transcript(self, transcript_text: str, mode: AnalysisType) -> LLMResponseSchema:
+        embedding = None
+        namespace = f"{self.model}:{mode.value}:{PROMPT_VERSION}"
+        if _semantic_cache is not None:
+            embedding = await _semantic_cache.embed(transcript_text[:2000])
+            if embedding is not None:
+                cached = _semantic_cache.lookup(namespace, embedding)
+                if cached is not None:
+                    logger.info("Semantic cache hit")
+                    return LLMResponseSchema.model_validate_json(cached)
+
+        # Sections run as independent requests so their completions are generated in parallel.
+        sections = await asyncio.gather(
+            *(self._invoke(chain, {"transcript": transcript_text}) for chain in self._chains_for(mode))
+        )
+        result = LLMResponseSchema.model_construct(**{name: value for section in sections for name, value in section})
+
+        if embedding is not None:
+            _semantic_cache.add(namespace, embedding, result.model_dump_json())
+        return result
+
+    async def _invoke(self, chain, inputs: Dict[str, Any]):
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(2),
+            wait=wait_exponential_jitter(initial=0.2, max=1.0),
+            retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+            reraise=True,
+        ):
+            with attempt:
+                return await _llm_breaker.call(chain.ainvoke, inputs)
+
+    def _cache_key(self, youtube_url: str, mode: AnalysisType) -> Optional[str]:
+        video_id = YouTubeService.extract_video_id(youtube_url)
+        if not video_id:
+            return None
+        return f"{video_id}:{mode.value}:{self.model}:{PROMPT_VERSION}"
+
     def _split_transcript(self, text: str, max_len: int = 400) -> List[TranscriptChunk]:
-        import re
-        sentences = re.split(r"(?<=[.!?])\s+", text.strip())
-        chunks, current, idx = [], "", 0
+        sentences = _SENT_SPLIT.split(text.strip())
+        chunks: List[TranscriptChunk] = []
+        buf: List[str] = []
+        buf_len = 0
         for s in sentences:
-            if len(current) + len(s) <= max_len:
-                current += (" " if current else "") + s
+            new_len = buf_len + len(s) + (1 if buf else 0)
+            if new_len <= max_len:
+                buf.append(s)
+                buf_len = new_len
             else:
-                if current:
-                    chunks.append(TranscriptChunk(index=idx, text=current))
-                    idx += 1
-                current = s
-        if current: chunks.append(TranscriptChunk(index=idx, text=current))
+                if buf_len:
+                    chunks.append(TranscriptChunk.model_construct(index=len(chunks), text=" ".join(buf)))
+                buf, buf_len = [s], len(s)
+        if buf_len:
+            chunks.append(TranscriptChunk.model_construct(index=len(chunks), text=" ".join(buf)))
         return chunks
 
     def _error_response(self, error_msg: str, start_time: float):
@@ -0,0 +1,60 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Tuple, Type
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Fails fast after ``fail_max`` consecutive upstream failures.
+
+    Once open, calls are rejected for ``reset_timeout`` seconds; the next call
+    after that is let through as a single probe. Calls arriving while it runs
+    wait for its outcome: they proceed if it closed the breaker and are
+    rejected if it re-opened it.
+    Only exceptions listed in ``failure_types`` count as upstream failures.
+    """
+
+    def __init__(
+        self,
+        fail_max: int = 5,
+        reset_timeout: float = 30.0,
+        failure_types: Tuple[Type[BaseException], ...] = (Exception,),
+    ):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failure_types = failure_types
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe: Optional[asyncio.Event] = None
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        # Half-open: wait for the in-flight probe, then re-check the state it left behind.
+        while self._probe is not None:
+            await self._probe.wait()
+
+        probe = None
+        if self._opened_at is not None:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("LLM upstream is unavailable, try again later")
+            probe = self._probe = asyncio.Event()
+
+        try:
+            result = await func(*args, **kwargs)
+        except self.failure_types:
+            self._failures += 1
+            if probe is not None or self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+            raise
+        else:
+            self._failures = 0
+            self._opened_at = None
+            return result
+        finally:
+            # Waiters wake to the state settled above; any other outcome (e.g. cancellation)
+            # leaves the breaker half-open so the next caller probes instead.
+            if probe is not None:
+                self._probe = None
+                probe.set()
@@ -0,0 +1,63 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_ollama import OllamaEmbeddings
+
+logger = logging.getLogger("SemanticCache")
+logger.setLevel(logging.INFO)
+
+
+class SemanticCache:
+    """In-memory cache of LLM results keyed by transcript embeddings.
+
+    Near-duplicate transcripts (mirrors, re-uploads) land within
+    ``max_distance`` cosine distance of each other and reuse the stored result.
+    """
+
+    def __init__(
+        self,
+        model: str = "nomic-embed-text",
+        max_distance: float = 0.08,
+        max_entries: int = 512,
+    ):
+        self.embedder = OllamaEmbeddings(model=model)
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        # namespace -> (row-normalized embedding matrix, serialized results)
+        self._stores: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+        self._warmed = False
+
+    async def warm_up(self) -> None:
+        """Have Ollama load the embedding model before the first real lookup."""
+        if self._warmed:
+            return
+        self._warmed = True
+        await self.embed("warm-up")
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await self.embedder.aembed_query(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Embedding failed, skipping semantic cache: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, namespace: str, embedding: np.ndarray) -> Optional[str]:
+        store = self._stores.get(namespace)
+        if store is None:
+            return None
+        matrix, payloads = store
+        similarities = matrix @ embedding
+        best = int(np.argmax(similarities))
+        if 1.0 - similarities[best] < self.max_distance:
+            return payloads[best]
+        return None
+
+    def add(self, namespace: str, embedding: np.ndarray, payload: str) -> None:
+        empty = np.empty((0, embedding.shape[0]), dtype=np.float32)
+        matrix, payloads = self._stores.get(namespace, (empty, []))
+        matrix = np.vstack([matrix, embedding])[-self.max_entries:]
+        payloads = (payloads + [payload])[-self.max_entries:]
+        self._stores[namespace] = (matrix, payloads)
@@ -1,68 +1,302 @@
+import io
+import os
 import re
+import html
+import json
+import shutil
+import logging
 import asyncio
-from typing import Dict, Any
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict
 
+import httpx
+from diskcache import Cache
 from langchain_community.document_loaders import YoutubeLoader
 
+logger = logging.getLogger("YouTubeService")
+logger.setLevel(logging.INFO)
+
+# watch?...v=, embed/, v/, shorts/, live/ and youtu.be/ forms; video IDs are exactly 11 chars
+# of [A-Za-z0-9_-].
+_VIDEO_ID_RE = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:[^ ]*?&)?v=|embed/|v/|shorts/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})",
+    re.ASCII,
+)
+_CANONICAL_PREFIX = "https://www.youtube.com/watch?v="
+
+# Successful transcript results by video_id; on disk so they survive restarts and are
+# shared between worker processes.
+_cache = Cache(os.getenv("YT_CACHE_DIR", ".cache/yt"), size_limit=2**30)
+_CACHE_TTL = 24 * 60 * 60
+# Bump when TranscriptResult changes shape so stale pickles on disk are never returned.
+_CACHE_VERSION = "v2"
+
+_UNKNOWN = "Unknown"
+_OEMBED_URL = "https://www.youtube.com/oembed"
+_WATCH_URL = "https://www.youtube.com/watch"
+_CAPTION_TRACKS_KEY = '"captionTracks":'
+# Optional second fallback; runs as a subprocess, so it needs no thread from _yt_pool.
+_YT_DLP = shutil.which("yt-dlp")
+_VTT_TAG_RE = re.compile(r"<[^>]+>")
+
+# YoutubeLoader blocks on network I/O; give it its own pool instead of queueing behind the
+# small default executor (min(32, cpu_count + 4)) shared with everything else.
+_yt_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("YT_THREAD_POOL_SIZE", (os.cpu_count() or 1) * 5)),
+    thread_name_prefix="yt-loader",
+)
+# Caps concurrent fetches against YouTube's per-IP rate limit; extra requests wait here.
+_rate_limit = asyncio.Semaphore(int(os.getenv("YT_MAX_CONCURRENT", 10)))
+# Deadline for one whole load (scrape, yt-dlp and loader together). A hung loader still
+# occupies its thread, but the caller stops waiting after this.
+_LOAD_TIMEOUT = float(os.getenv("YT_LOAD_TIMEOUT", 20.0))
+
+# One pooled HTTP/2 client for every caption and oEmbed request, so repeat calls reuse the
+# TLS connection to youtube.com instead of handshaking each time. Created lazily.
+_http_client: httpx.AsyncClient | None = None
+
+
+def _client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=_LOAD_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        )
+    return _http_client
+
+
+@dataclass(slots=True)
+class TranscriptResult:
+    success: bool
+    transcript: str = ""
+    video_title: str = _UNKNOWN
+    author: str = _UNKNOWN
+    video_id: str | None = None
+    error: str | None = None
+
+
 class YouTubeService:
+    """Stateless namespace: call everything on the class, no instance needed."""
+
+    __slots__ = ()
+    _inflight: Dict[str, "asyncio.Future[TranscriptResult]"] = {}
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def extract_video_id(url: str) -> str | None:
-        patterns = [
-            r"(?:youtube\.com/watch\?v=|youtu\.be/)([^&/\?\n]+)",
-            r"youtube\.com/embed/([^&/\?\n]+)",
-            r"youtube\.com/v/([^&/\?\n]+)",
-        ]
-        for p in patterns:
-            m = re.search(p, url)
-            if m:
-                return m.group(1)
-        return None
+        m = _VIDEO_ID_RE.search(url)
+        return m.group(1) if m else None
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        _cache.clear()
 
     @staticmethod
-    def clean_youtube_url(url: str) -> str:
-        vid = YouTubeService.extract_video_id(url)
-        return f"https://www.youtube.com/watch?v={vid}" if vid else url
+    async def aclose() -> None:
+        global _http_client
+        if _http_client is not None:
+            await _http_client.aclose()
+            _http_client = None
+
+    @staticmethod
+    def _remember(vid: str, result: TranscriptResult) -> TranscriptResult:
+        _cache.set(f"{vid}:{_CACHE_VERSION}", result, expire=_CACHE_TTL)
+        return result
+
+    @staticmethod
+    def _ok(transcript: str, vid: str | None, meta: Dict[str, str] | None) -> TranscriptResult:
+        if meta:
+            return TranscriptResult(True, transcript.strip(), meta["title"], meta["author"], vid)
+        return TranscriptResult(True, transcript.strip(), video_id=vid)
+
+    @staticmethod
+    async def _fetch_oembed(url: str, client: httpx.AsyncClient) -> Dict[str, str] | None:
+        # Title and author from YouTube's oEmbed endpoint: one async request, no loader thread.
+        try:
+            resp = await client.get(_OEMBED_URL, params={"url": url, "format": "json"})
+            resp.raise_for_status()
+            data = resp.json()
+            return {"title": data.get("title", _UNKNOWN), "author": data.get("author_name", _UNKNOWN)}
+        except Exception:
+            # Metadata is optional; an unexpected payload must not fail the gather in _load.
+            # exc_info only when debug is on: formatting the traceback walks every frame.
+            logger.debug("oEmbed lookup failed for %s", url, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return None
 
-    async def get_transcript_async(self, url: str) -> Dict[str, Any]:
-        cleaned = self.clean_youtube_url(url)
+    @staticmethod
+    async def _fetch_timedtext(vid: str, client: httpx.AsyncClient) -> str | None:
+        """English captions read straight from the watch page's caption track, or None."""
+        try:
+            async with _rate_limit:
+                page = await client.get(_WATCH_URL, params={"v": vid})
+                page.raise_for_status()
+                start = page.text.find(_CAPTION_TRACKS_KEY)
+                if start < 0:
+                    logger.debug("No caption tracks on the watch page for %s", vid)
+                    return None
+                tracks, _ = json.JSONDecoder().raw_decode(page.text, start + len(_CAPTION_TRACKS_KEY))
+                track = next((t for t in tracks if t.get("languageCode") == "en"), None)
+                if track is None:
+                    logger.debug("No English caption track for %s", vid)
+                    return None
+                resp = await client.get(track["baseUrl"])
+                resp.raise_for_status()
+
+            texts = [
+                html.unescape(elem.text).strip()
+                for _, elem in ET.iterparse(io.BytesIO(resp.content), events=("end",))
+                if elem.tag == "text" and elem.text
+            ]
+        except Exception:
+            # Scraping YouTube's page is best effort: any surprise in its markup falls through
+            # to the next fallback instead of failing the request.
+            logger.debug("Caption fetch failed for %s", vid, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return None
+        return " ".join(texts) or None
+
+    @staticmethod
+    def _parse_vtt(text: str) -> str:
+        lines: list[str] = []
 
+        def add(line: str) -> None:
+            line = html.unescape(_VTT_TAG_RE.sub("", line)).strip()
+            # Auto-generated captions repeat each line as it scrolls; keep one copy.
+            if line and (not lines or lines[-1] != line):
+                lines.append(line)
+
+        # A digits-only line is a cue identifier only when it starts a block and the timing
+        # line follows directly; otherwise it is spoken text such as a year.
+        pending = None
+        block_start = True
+        for line in text.splitlines():
+            line = line.strip()
+            if pending is not None:
+                if "-->" not in line:
+                    add(pending)
+                pending = None
+            if not line:
+                block_start = True
+                continue
+            at_block_start, block_start = block_start, False
+            if "-->" in line or line.startswith(("WEBVTT", "Kind:", "Language:", "NOTE")):
+                continue
+            if line.isdigit() and at_block_start:
+                pending = line
+            else:
+                add(line)
+        if pending is not None:
+            add(pending)
+        return " ".join(lines)
+
+    @staticmethod
+    async def _fetch_ytdlp(vid: str, client: httpx.AsyncClient) -> str | None:
+        """English captions located by the yt-dlp CLI, or None if it is missing or finds none."""
+        if _YT_DLP is None:
+            return None
         try:
-            loader = YoutubeLoader.from_youtube_url(cleaned, add_video_info=True)
-            docs = await asyncio.to_thread(loader.load)
-
-            if docs:
-                return {
-                    "success": True,
-                    "transcript": docs[0].page_content.strip(),
-                    "video_title": docs[0].metadata.get("title", "Unknown"),
-                    "author": docs[0].metadata.get("author", "Unknown"),
-                    "video_id": self.extract_video_id(url),
-                }
+            async with _rate_limit:
+                proc = await asyncio.create_subprocess_exec(
+                    _YT_DLP, "--dump-json", "--skip-download", "--no-warnings", "--", vid,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+                try:
+                    out, _ = await proc.communicate()
+                finally:
+                    # Cancelled by the load deadline: don't leave yt-dlp running.
+                    if proc.returncode is None:
+                        proc.kill()
+                if proc.returncode:
+                    logger.debug("yt-dlp exited with %s for %s", proc.returncode, vid)
+                    return None
 
+                info = json.loads(out)
+                tracks = (info.get("subtitles") or {}).get("en") or (info.get("automatic_captions") or {}).get("en") or []
+                track_url = next((t["url"] for t in tracks if t.get("ext") == "vtt"), None)
+                if track_url is None:
+                    logger.debug("yt-dlp found no English VTT track for %s", vid)
+                    return None
+                resp = await client.get(track_url)
+                resp.raise_for_status()
         except Exception:
-            pass
+            # Like the watch-page scrape, unexpected output just falls through to the loader.
+            logger.debug("yt-dlp caption fetch failed for %s", vid, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return None
+        return YouTubeService._parse_vtt(resp.text) or None
+
+    @staticmethod
+    async def get_transcript_async(url: str) -> TranscriptResult:
+        vid = YouTubeService.extract_video_id(url)
+        if not vid:
+            # Unrecognised URL shape: let YoutubeLoader apply its own URL parsing.
+            logger.debug("No video ID in %s, handing the URL to YoutubeLoader", url)
+            return await YouTubeService._within_deadline(
+                YouTubeService._from_loader(
+                    lambda: YoutubeLoader.from_youtube_url(url, add_video_info=False).load(), None, None
+                ),
+                None,
+            )
+        if (hit := _cache.get(f"{vid}:{_CACHE_VERSION}")) is not None:
+            return hit
+
+        # Concurrent requests for the same video share one download.
+        pending = YouTubeService._inflight.get(vid)
+        if pending is None:
+            pending = asyncio.ensure_future(
+                YouTubeService._within_deadline(YouTubeService._load(vid), vid)
+            )
+            YouTubeService._inflight[vid] = pending
+            pending.add_done_callback(lambda _: YouTubeService._inflight.pop(vid, None))
+        return await asyncio.shield(pending)
 
+    @staticmethod
+    async def _within_deadline(work: Awaitable[TranscriptResult], vid: str | None) -> TranscriptResult:
+        # One deadline for the whole fallback chain, so a miss costs at most YT_LOAD_TIMEOUT
+        # rather than one full timeout per step.
         try:
-            loader = YoutubeLoader.from_youtube_url(cleaned, add_video_info=False)
-            docs = await asyncio.to_thread(loader.load)
-
-            if docs:
-                return {
-                    "success": True,
-                    "transcript": docs[0].page_content.strip(),
-                    "video_title": "Unknown",
-                    "author": "Unknown",
-                    "video_id": self.extract_video_id(url),
-                }
+            return await asyncio.wait_for(work, timeout=_LOAD_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Transcript load timed out: {vid}")
+            return TranscriptResult(False, video_id=vid, error="timeout")
+
+    @staticmethod
+    async def _load(vid: str) -> TranscriptResult:
+        # Captions and metadata are plain async HTTP requests; no loader thread on the happy path.
+        client = _client()
+        transcript, meta = await asyncio.gather(
+            YouTubeService._fetch_timedtext(vid, client),
+            YouTubeService._fetch_oembed(f"{_CANONICAL_PREFIX}{vid}", client),
+        )
+        if transcript:
+            return YouTubeService._remember(vid, YouTubeService._ok(transcript, vid, meta))
+
+        if transcript := await YouTubeService._fetch_ytdlp(vid, client):
+            return YouTubeService._remember(vid, YouTubeService._ok(transcript, vid, meta))
 
+        logger.debug("Falling back to YoutubeLoader for %s", vid)
+        # The ID is already known; from_youtube_url would only parse it out again.
+        return await YouTubeService._from_loader(
+            lambda: YoutubeLoader(vid, add_video_info=False).load(), vid, meta
+        )
+
+    @staticmethod
+    async def _from_loader(
+        fetch: Callable[[], list], vid: str | None, meta: Dict[str, str] | None
+    ) -> TranscriptResult:
+        try:
+            async with _rate_limit:
+                docs = await asyncio.get_running_loop().run_in_executor(_yt_pool, fetch)
         except Exception as e:
-            return {
-                "success": False,
-                "transcript": "",
-                "video_title": "Unknown",
-                "author": "Unknown",
-                "error": f"Failed to load transcript: {str(e)}",
-            }
-
-        return {"success": False, "error": "Transcript not found"}
+            logger.warning(f"Transcript load failed for {vid}: {e}")
+            return TranscriptResult(False, video_id=vid, error=f"Failed to load transcript: {str(e)}")
+
+        if docs:
+            result = YouTubeService._ok(docs[0].page_content, vid, meta)
+            return YouTubeService._remember(vid, result) if vid else result
+
+        return TranscriptResult(False, video_id=vid, error="Transcript not found")
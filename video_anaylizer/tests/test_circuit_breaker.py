@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+
+from src.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class UpstreamDown(Exception):
+    pass
+
+
+class CircuitBreakerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker(fail_max=1, reset_timeout=0.01, failure_types=(UpstreamDown,))
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise UpstreamDown()
+
+        with self.assertRaises(UpstreamDown):
+            await breaker.call(failing)
+        await asyncio.sleep(0.02)
+
+        results = await asyncio.gather(*(breaker.call(failing) for _ in range(10)), return_exceptions=True)
+
+        self.assertEqual(calls, 2)
+        self.assertEqual(sum(isinstance(r, UpstreamDown) for r in results), 1)
+        self.assertEqual(sum(isinstance(r, CircuitOpenError) for r in results), 9)
+
+    async def test_half_open_callers_follow_a_successful_probe(self):
+        breaker = CircuitBreaker(fail_max=1, reset_timeout=0.01, failure_types=(UpstreamDown,))
+        calls = 0
+
+        async def failing():
+            raise UpstreamDown()
+
+        async def ok():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        with self.assertRaises(UpstreamDown):
+            await breaker.call(failing)
+        await asyncio.sleep(0.02)
+
+        # One analysis fans out three section calls at once.
+        results = await asyncio.gather(*(breaker.call(ok) for _ in range(3)), return_exceptions=True)
+
+        self.assertEqual(results, ["ok", "ok", "ok"])
+        self.assertEqual(calls, 3)
+
+    async def test_successful_probe_closes_breaker(self):
+        breaker = CircuitBreaker(fail_max=1, reset_timeout=0.01, failure_types=(UpstreamDown,))
+
+        async def failing():
+            raise UpstreamDown()
+
+        async def ok():
+            return "ok"
+
+        with self.assertRaises(UpstreamDown):
+            await breaker.call(failing)
+        with self.assertRaises(CircuitOpenError):
+            await breaker.call(ok)
+        await asyncio.sleep(0.02)
+
+        self.assertEqual(await breaker.call(ok), "ok")
+        self.assertEqual(await breaker.call(ok), "ok")
+
+    async def test_failed_probe_reopens_breaker(self):
+        breaker = CircuitBreaker(fail_max=3, reset_timeout=0.01, failure_types=(UpstreamDown,))
+
+        async def failing():
+            raise UpstreamDown()
+
+        for _ in range(3):
+            with self.assertRaises(UpstreamDown):
+                await breaker.call(failing)
+        await asyncio.sleep(0.02)
+
+        with self.assertRaises(UpstreamDown):
+            await breaker.call(failing)
+        with self.assertRaises(CircuitOpenError):
+            await breaker.call(failing)
+
+
+if __name__ == "__main__":
+    unittest.main()